@@ -0,0 +1,40 @@
+#!/usr/bin/env bash
+# Build a single-file slipstream CLI at dist/slipstream.pyz using shiv.
+#
+# The bundle contains the package, its dependencies pinned to poetry.lock and
+# scripts/cli.py. Running it skips poetry's virtualenv resolution. On the first
+# run shiv extracts the whole bundled site-packages to ~/.shiv and reuses it
+# afterwards.
+#
+# Requires poetry with the export plugin (`poetry self add poetry-plugin-export`
+# on Poetry 2) and shiv on PATH (e.g. `pipx install shiv`).
+#
+# Usage:
+#   ./scripts/build_cli.sh
+#   ./dist/slipstream.pyz stats
+set -euo pipefail
+
+cd "$(dirname "$0")/.."
+
+BUILD_DIR=build/pyz
+OUTPUT=dist/slipstream.pyz
+
+rm -rf "$BUILD_DIR"
+mkdir -p "$BUILD_DIR" "$(dirname "$OUTPUT")"
+
+# Install exactly the locked runtime dependencies, then the package itself
+# without letting pip resolve anything on its own.
+poetry export --only main --format requirements.txt --without-hashes \
+    --output build/requirements.txt
+python -m pip install --quiet --no-deps --target "$BUILD_DIR" -r build/requirements.txt
+python -m pip install --quiet --no-deps --target "$BUILD_DIR" .
+cp scripts/cli.py "$BUILD_DIR/slipstream_cli.py"
+
+shiv \
+    --site-packages "$BUILD_DIR" \
+    --entry-point slipstream_cli:cli \
+    --python "/usr/bin/env python3" \
+    --compressed \
+    --output-file "$OUTPUT"
+
+echo "Built $OUTPUT"
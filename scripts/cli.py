@@ -1,11 +1,6 @@
-import json
-
 import click
-from slipstream.analysis.query import execute_query, get_summary_stats
-from slipstream.ingest.auth import build_authorization_url, exchange_code_for_token
-from slipstream.ingest.backfill import backfill_activities
-from slipstream.ingest.strava import fetch_activity_streams, list_activities
-from slipstream.settings import settings
+
+from slipstream.ingest.streams import STREAM_TYPES
 
 
 @click.group()
@@ -17,6 +12,9 @@ def cli():
 @cli.command(name="auth-start")
 def auth_start():
     """Print the authorization URL to visit in a browser."""
+    from slipstream.ingest.auth import build_authorization_url
+    from slipstream.settings import settings
+
     url = build_authorization_url(
         str(settings.STRAVA_CLIENT_ID),
         settings.STRAVA_REDIRECT_URI,
@@ -32,6 +30,9 @@ def auth_exchange(code: str):
 
     This will print the tokens that you need to set as environment variables.
     """
+    from slipstream.ingest.auth import exchange_code_for_token
+    from slipstream.settings import settings
+
     resp = exchange_code_for_token(
         code,
         str(settings.STRAVA_CLIENT_ID),
@@ -52,48 +53,122 @@ def auth_exchange(code: str):
 @cli.command(name="fetch-activities")
 @click.option("--per-page", default=30, help="Activities per page")
 @click.option("--page", default=1, help="Page number")
+@click.option("--pages", default=1, help="Number of consecutive pages to fetch")
+@click.option("--concurrency", default=4, help="Number of pages to fetch in parallel")
 @click.option(
     "--before", type=int, help="Epoch timestamp: filter activities before this time"
 )
 @click.option(
     "--after", type=int, help="Epoch timestamp: filter activities after this time"
 )
+@click.option(
+    "--refresh", is_flag=True, help="Ignore cached responses and refetch from Strava"
+)
 def fetch_activities_cmd(
-    per_page: int, page: int, before: int | None, after: int | None
+    per_page: int,
+    page: int,
+    pages: int,
+    concurrency: int,
+    before: int | None,
+    after: int | None,
+    refresh: bool,
 ):
-    """Fetch and print a page of activities for the authorized user."""
-    acts = list_activities(per_page=per_page, page=page, before=before, after=after)
-    click.echo(f"Found activities: {len(acts) if isinstance(acts, list) else 0}")
-    for a in acts:
-        click.echo(
-            f"{a['id']}: {a.get('name')} ({a.get('type')}) {a.get('start_date')}"
+    """Fetch and print one or more pages of activities for the authorized user."""
+    from operator import itemgetter
+
+    from slipstream.ingest.strava import list_activities, list_activity_pages
+
+    if pages > 1:
+        acts = [
+            a
+            for page_acts in list_activity_pages(
+                pages,
+                per_page=per_page,
+                page=page,
+                before=before,
+                after=after,
+                max_workers=concurrency,
+                refresh=refresh,
+            )
+            for a in page_acts
+        ]
+    else:
+        acts = list_activities(
+            per_page=per_page,
+            page=page,
+            before=before,
+            after=after,
+            refresh=refresh,
         )
+    fields = itemgetter("id", "name", "type", "start_date")
+    lines = [f"Found activities: {len(acts) if isinstance(acts, list) else 0}"]
+    lines.extend(
+        f"{id_}: {name} ({type_}) {start_date}"
+        for id_, name, type_, start_date in map(fields, acts)
+    )
+    click.echo("\n".join(lines))
 
 
 @cli.command(name="fetch-stream")
 @click.argument("activity_id", type=int)
-@click.option("--output", "-o", help="Output file path (JSON)")
-@click.option("--pretty/--no-pretty", default=True, help="Pretty print JSON")
+@click.option("--output", "-o", help="Output file path (JSON or parquet)")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "parquet"]),
+    default="json",
+    help="Output format (parquet requires --output)",
+)
 @click.option(
-    "--keys",
-    help="Comma-separated stream types (e.g., 'heartrate,watts,cadence'). Defaults to all available streams.",
+    "--pretty/--no-pretty",
+    default=True,
+    help="Pretty print JSON (--no-pretty is faster for large streams)",
 )
-def fetch_stream(activity_id: int, output: str, pretty: bool, keys: str):
+@click.option(
+    "--key",
+    "keys",
+    multiple=True,
+    type=click.Choice(STREAM_TYPES),
+    help="Stream type to fetch (repeatable). Defaults to all available streams.",
+)
+def fetch_stream(
+    activity_id: int,
+    output: str,
+    output_format: str,
+    pretty: bool,
+    keys: tuple[str, ...],
+):
     """Fetch streams for a single activity and print or save the data."""
+    import json
+
+    from slipstream.ingest.strava import fetch_activity_streams
+
+    if output_format == "parquet" and not output:
+        raise click.UsageError("--format parquet requires --output")
+
     if keys:
         streams = fetch_activity_streams(activity_id, keys=keys)
     else:
         streams = fetch_activity_streams(activity_id)
 
+    if output_format == "parquet":
+        from slipstream.ingest.backfill import write_streams_parquet
+
+        num_points = write_streams_parquet(streams, output)
+        click.echo(f"Saved {num_points} data points to {output}")
+        return
+
     if output:
         with open(output, "w") as f:
-            json.dump(streams, f, indent=2 if pretty else None)
+            if pretty:
+                json.dump(streams, f, indent=2)
+            else:
+                # Compact output can use the C encoder via json.dumps; json.dump
+                # always goes through the pure-Python chunked encoder.
+                f.write(json.dumps(streams))
         click.echo(f"Saved stream data to {output}")
     else:
-        if pretty:
-            click.echo(json.dumps(streams, indent=2))
-        else:
-            click.echo(json.dumps(streams))
+        click.echo(json.dumps(streams, indent=2 if pretty else None))
 
 
 @cli.command(name="backfill-activities")
@@ -152,6 +227,8 @@ def backfill_activities_cmd(
     # Use 10 parallel workers for faster downloads
     poetry run python scripts/cli.py backfill-activities --max-workers 10
     """
+    from slipstream.ingest.backfill import backfill_activities
+
     backfill_activities(
         max_activities=max_activities,
         before=before,
@@ -162,7 +239,14 @@ def backfill_activities_cmd(
 
 @cli.command(name="query")
 @click.argument("sql")
-def query_cmd(sql: str):
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["tsv", "csv", "parquet", "arrow"]),
+    default="tsv",
+    help="Output format written to stdout (default: tsv)",
+)
+def query_cmd(sql: str, output_format: str):
     """Execute a SQL query against parquet files.
 
     You can reference 'metadata' and 'activities' tables in your queries.
@@ -175,17 +259,59 @@ def query_cmd(sql: str):
 
     \b
     # Get activities with power data
-    poetry run python scripts/cli.py query "SELECT COUNT(DISTINCT filename) FROM 'data/activities/*.parquet' WHERE watts IS NOT NULL"
+    poetry run python scripts/cli.py query "SELECT COUNT(DISTINCT filename) FROM activities WHERE watts IS NOT NULL"
+
+    \b
+    # Name only the columns you need; DuckDB then skips the rest on disk
+    poetry run python scripts/cli.py query "SELECT filename, AVG(watts) FROM activities WHERE heartrate > 150 GROUP BY filename"
+
+    \b
+    # Export query results as parquet for other tools
+    poetry run python scripts/cli.py query --format parquet "SELECT * FROM metadata" > metadata.parquet
+
+    \b
+    # Pipe an Arrow IPC stream into another process
+    poetry run python scripts/cli.py query --format arrow "SELECT * FROM activities" | my-tool
     """
+    import sys
+
+    from slipstream.analysis.query import execute_query, execute_query_arrow
+
     try:
+        if output_format == "csv":
+            from pyarrow import csv
+
+            reader = execute_query_arrow(sql)
+            with csv.CSVWriter(sys.stdout.buffer, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            return
+
+        if output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            reader = execute_query_arrow(sql)
+            with pq.ParquetWriter(sys.stdout.buffer, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            return
+
+        if output_format == "arrow":
+            import pyarrow as pa
+
+            reader = execute_query_arrow(sql)
+            with pa.ipc.new_stream(sys.stdout.buffer, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            return
+
         results = execute_query(sql)
 
         if not results:
             click.echo("No results")
             return
 
-        for row in results:
-            click.echo("\t".join(str(x) for x in row))
+        click.echo("\n".join("\t".join(map(str, row)) for row in results))
 
     except Exception as e:
         click.echo(f"Error executing query: {e}", err=True)
@@ -194,41 +320,44 @@ def query_cmd(sql: str):
 @cli.command(name="stats")
 def stats_cmd():
     """Show summary statistics about downloaded activities."""
+    from slipstream.analysis.query import get_summary_stats
+
     stats = get_summary_stats()
 
     if "error" in stats:
         click.echo(stats["error"], err=True)
         return
 
-    click.echo("=" * 60)
-    click.echo("ACTIVITY SUMMARY STATISTICS")
-    click.echo("=" * 60)
-    click.echo()
-
-    click.echo(f"Total Activities: {stats['total_activities']}")
-    click.echo(f"Date Range: {stats['first_activity']} to {stats['last_activity']}")
-    click.echo()
-
-    click.echo(f"Total Distance: {stats['total_km']:,.1f} km")
-    click.echo(f"Total Time: {stats['total_hours']:,.1f} hours")
-    click.echo(f"Total Elevation: {stats['total_elevation_m']:,.1f} m")
-    click.echo()
-
-    click.echo("Activities by Type:")
-    for activity_type, count in stats["by_type"]:
-        click.echo(f"  {activity_type}: {count}")
-    click.echo()
+    # Assemble the report and write it once rather than echoing line by line
+    lines = [
+        "=" * 60,
+        "ACTIVITY SUMMARY STATISTICS",
+        "=" * 60,
+        "",
+        f"Total Activities: {stats['total_activities']}",
+        f"Date Range: {stats['first_activity']} to {stats['last_activity']}",
+        "",
+        f"Total Distance: {stats['total_km']:,.1f} km",
+        f"Total Time: {stats['total_hours']:,.1f} hours",
+        f"Total Elevation: {stats['total_elevation_m']:,.1f} m",
+        "",
+        "Activities by Type:",
+    ]
+    lines.extend(
+        f"  {activity_type}: {count}" for activity_type, count in stats["by_type"]
+    )
+    lines.append("")
 
     if stats["by_year"]:
-        click.echo("Activities by Year:")
-        for year, count in stats["by_year"]:
-            click.echo(f"  {int(year)}: {count}")
-        click.echo()
+        lines.append("Activities by Year:")
+        lines.extend(f"  {int(year)}: {count}" for year, count in stats["by_year"])
+        lines.append("")
 
     if stats["by_month"]:
-        click.echo("Recent Months (last 12):")
-        for month, count in stats["by_month"]:
-            click.echo(f"  {month}: {count}")
+        lines.append("Recent Months (last 12):")
+        lines.extend(f"  {month}: {count}" for month, count in stats["by_month"])
+
+    click.echo("\n".join(lines))
 
 
 @cli.command(name="web")
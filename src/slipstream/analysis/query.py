@@ -1,150 +1,260 @@
 from __future__ import annotations
 
+import threading
+from collections.abc import Iterable
+from datetime import date
 from pathlib import Path
 
 import duckdb
+import pyarrow as pa
+
+from slipstream import cache
 
 
 ACTIVITIES_DIR = Path("data/activities")
 METADATA_FILE = Path("data/metadata.parquet")
 
+# Connection settings per workload. The object cache keeps decoded parquet
+# footers around between queries. Summary stats and stream coverage scan a few
+# MB of local parquet, where a small thread pool starts faster than one worker
+# per core; ad-hoc queries may scan every activity file, so they keep DuckDB's
+# default threads and memory limit.
+DUCKDB_CONFIGS = {
+    "query": {"enable_object_cache": True},
+    "summary": {
+        "threads": 2,
+        "memory_limit": "512MB",
+        "enable_object_cache": True,
+    },
+}
+
+
+# View name -> (file or directory it reads, SELECT it is defined as).
+# union_by_name: activities without e.g. GPS or power lack those columns;
+# filename exposes which activity file each row came from.
+VIEWS = {
+    "metadata": (METADATA_FILE, f"SELECT * FROM '{METADATA_FILE}'"),
+    "activities": (
+        ACTIVITIES_DIR,
+        f"""
+        SELECT * FROM read_parquet(
+            '{ACTIVITIES_DIR}/*.parquet',
+            union_by_name=true,
+            hive_partitioning=false,
+            filename=true
+        )
+        """,
+    ),
+}
+
 
-def execute_query(sql: str) -> list[tuple]:
+# One shared connection per DUCKDB_CONFIGS entry, and the source mtime each
+# of its views was created from
+_conns: dict[str, duckdb.DuckDBPyConnection] = {}
+_conn_views: dict[tuple[str, str], int] = {}
+_conn_lock = threading.Lock()
+
+
+def _source_mtime_ns(source: Path) -> int | None:
+    """Return the mtime of a view's source, or None if it has no data yet."""
+    try:
+        if source.is_dir() and next(source.glob("*.parquet"), None) is None:
+            return None
+        return source.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_conn(
+    views: Iterable[str] = VIEWS, profile: str = "query"
+) -> duckdb.DuckDBPyConnection:
+    """Return a shared in-memory connection with the requested views registered.
+
+    One connection per `profile` (a DUCKDB_CONFIGS key) is created per process
+    and reused by every query. Each view is (re)created when its file or
+    directory changes, so new files or columns are picked up, and skipped
+    while it has no parquet files to read.
+    """
+    with _conn_lock:
+        conn = _conns.get(profile)
+        if conn is None:
+            conn = duckdb.connect(":memory:", config=DUCKDB_CONFIGS[profile])
+            _conns[profile] = conn
+
+        for name in views:
+            source, select = VIEWS[name]
+            mtime_ns = _source_mtime_ns(source)
+            if mtime_ns is not None and _conn_views.get((profile, name)) != mtime_ns:
+                conn.execute(f"CREATE OR REPLACE VIEW {name} AS {select}")
+                _conn_views[(profile, name)] = mtime_ns
+
+        return conn
+
+
+def execute_query(
+    sql: str, conn: duckdb.DuckDBPyConnection | None = None
+) -> list[tuple]:
     """Execute a SQL query against the parquet files.
 
+    Each call runs on its own cursor, so threads can share one connection
+    (and its views and caches) without sharing a pending result.
+
     Args:
         sql: SQL query string. Can reference:
              - 'metadata' for data/metadata.parquet
              - 'activities' for data/activities/*.parquet
+        conn: Connection to query; defaults to the shared module connection
 
     Returns:
         List of result tuples
     """
-    conn = duckdb.connect(":memory:")
+    return (conn or _get_conn()).cursor().execute(sql).fetchall()
 
-    # Register views for easier querying
-    if METADATA_FILE.exists():
-        conn.execute(f"CREATE VIEW metadata AS SELECT * FROM '{METADATA_FILE}'")
 
-    if ACTIVITIES_DIR.exists():
-        conn.execute(
-            f"CREATE VIEW activities AS SELECT * FROM '{ACTIVITIES_DIR}/*.parquet'"
-        )
+def execute_query_arrow(
+    sql: str, conn: duckdb.DuckDBPyConnection | None = None
+) -> pa.RecordBatchReader:
+    """Execute a SQL query and stream the result as Arrow record batches.
 
-    result = conn.execute(sql).fetchall()
-    conn.close()
+    Unlike `execute_query`, rows are never materialized as Python tuples,
+    so large results can be written out (CSV, parquet) by Arrow's native
+    writers.
 
-    return result
+    Args:
+        sql: SQL query string (same views as `execute_query`)
+        conn: Connection to query; defaults to the shared module connection
+
+    Returns:
+        Reader yielding the result in record batches
+    """
+    return (conn or _get_conn()).cursor().execute(sql).fetch_record_batch()
 
 
 def get_summary_stats() -> dict[str, any]:
-    """Get summary statistics about downloaded activities."""
+    """Get summary statistics about downloaded activities.
+
+    Results are cached on disk until metadata.parquet changes (or the day
+    rolls over, since the monthly breakdown is relative to today).
+    """
 
     if not METADATA_FILE.exists():
         return {"error": "No metadata file found. Run backfill-activities first."}
 
-    conn = duckdb.connect(":memory:")
-    conn.execute(f"CREATE VIEW metadata AS SELECT * FROM '{METADATA_FILE}'")
+    key = f"{METADATA_FILE.resolve()}:{METADATA_FILE.stat().st_mtime_ns}:{date.today()}"
+    cache_file = cache.cache_path("stats", key)
 
-    # Total activities
-    total = conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+    stats = cache.load(cache_file)
+    if stats is None:
+        stats = _compute_summary_stats()
+        cache.store(cache_file, stats)
+        cache.purge("stats", keep=cache_file)
+    else:
+        # JSON turns the (key, count) pairs into lists; restore the tuples
+        for breakdown in ("by_type", "by_year", "by_month"):
+            stats[breakdown] = [tuple(entry) for entry in stats[breakdown]]
 
-    # Activities by type
-    by_type = conn.execute(
-        """
-        SELECT type, COUNT(*) as count
-        FROM metadata
-        GROUP BY type
-        ORDER BY count DESC
-    """
-    ).fetchall()
+    return stats
 
-    # Total distance and time
-    totals = conn.execute(
+
+def _compute_summary_stats() -> dict[str, any]:
+    """Compute summary statistics from the metadata parquet file."""
+    conn = _get_conn(["metadata"], profile="summary")
+
+    # One pass over the parquet file: the materialized CTE is scanned once
+    # and every breakdown is aggregated from it into a single result row.
+    row = conn.execute(
         """
+        WITH base AS MATERIALIZED (
+            SELECT
+                type,
+                distance,
+                moving_time,
+                total_elevation_gain,
+                start_date,
+                start_date::TIMESTAMP as ts
+            FROM metadata
+        ),
+        by_type AS (
+            SELECT type, COUNT(*) as count
+            FROM base
+            GROUP BY type
+        ),
+        by_year AS (
+            SELECT EXTRACT(year FROM ts) as year, COUNT(*) as count
+            FROM base
+            GROUP BY year
+        ),
+        by_month AS (
+            SELECT STRFTIME(ts, '%Y-%m') as month, COUNT(*) as count
+            FROM base
+            WHERE ts >= CURRENT_DATE - INTERVAL 12 MONTHS
+            GROUP BY month
+            ORDER BY month DESC
+            LIMIT 12
+        )
         SELECT
+            COUNT(*) as total,
             SUM(distance) / 1000 as total_km,
             SUM(moving_time) / 3600 as total_hours,
-            SUM(total_elevation_gain) as total_elevation_m
-        FROM metadata
-    """
-    ).fetchone()
-
-    # Date range
-    date_range = conn.execute(
-        """
-        SELECT
+            SUM(total_elevation_gain) as total_elevation_m,
             MIN(start_date) as first_activity,
-            MAX(start_date) as last_activity
-        FROM metadata
+            MAX(start_date) as last_activity,
+            (SELECT list({'key': type, 'count': count} ORDER BY count DESC)
+             FROM by_type) as by_type,
+            (SELECT list({'key': year, 'count': count} ORDER BY year DESC)
+             FROM by_year) as by_year,
+            (SELECT list({'key': month, 'count': count} ORDER BY month DESC)
+             FROM by_month) as by_month
+        FROM base
     """
     ).fetchone()
 
-    # Activities per year
-    by_year = conn.execute(
-        """
-        SELECT
-            EXTRACT(year FROM start_date::TIMESTAMP) as year,
-            COUNT(*) as count
-        FROM metadata
-        GROUP BY year
-        ORDER BY year DESC
-    """
-    ).fetchall()
-
-    # Activities per month (last 12 months)
-    by_month = conn.execute(
-        """
-        SELECT
-            STRFTIME(start_date::TIMESTAMP, '%Y-%m') as month,
-            COUNT(*) as count
-        FROM metadata
-        WHERE start_date::TIMESTAMP >= CURRENT_DATE - INTERVAL 12 MONTHS
-        GROUP BY month
-        ORDER BY month DESC
-        LIMIT 12
-    """
-    ).fetchall()
-
-    conn.close()
+    total, total_km, total_hours, total_elevation_m, first, last = row[:6]
+    by_type, by_year, by_month = (
+        [(entry["key"], entry["count"]) for entry in breakdown or []]
+        for breakdown in row[6:]
+    )
 
     return {
         "total_activities": total,
         "by_type": by_type,
-        "total_km": round(totals[0], 1) if totals[0] else 0,
-        "total_hours": round(totals[1], 1) if totals[1] else 0,
-        "total_elevation_m": round(totals[2], 1) if totals[2] else 0,
-        "first_activity": date_range[0],
-        "last_activity": date_range[1],
+        "total_km": round(total_km, 1) if total_km else 0,
+        "total_hours": round(total_hours, 1) if total_hours else 0,
+        "total_elevation_m": round(total_elevation_m, 1) if total_elevation_m else 0,
+        "first_activity": first,
+        "last_activity": last,
         "by_year": by_year,
         "by_month": by_month,
     }
 
 
 def get_stream_coverage() -> dict[str, int]:
-    """Check which activities have which stream types."""
+    """Check which activities have which stream types.
 
-    if not ACTIVITIES_DIR.exists():
-        return {"error": "No activities directory found."}
+    Counts activity files whose schema contains each stream column. Only the
+    parquet footers are read, never the row data.
+    """
 
-    conn = duckdb.connect(":memory:")
+    if _source_mtime_ns(ACTIVITIES_DIR) is None:
+        return {"error": "No activity files found."}
 
-    # Query all activity files and check which columns exist
+    conn = _get_conn([], profile="summary")
+
+    # Each stream is written as a column only when Strava returned it, so
+    # column presence in a file's schema means the activity has that stream.
     result = conn.execute(
         f"""
         SELECT
-            COUNT(*) as total_files,
-            COUNT(CASE WHEN heartrate IS NOT NULL THEN 1 END) as has_heartrate,
-            COUNT(CASE WHEN watts IS NOT NULL THEN 1 END) as has_power,
-            COUNT(CASE WHEN cadence IS NOT NULL THEN 1 END) as has_cadence,
-            COUNT(CASE WHEN lat IS NOT NULL THEN 1 END) as has_gps,
-            COUNT(CASE WHEN altitude IS NOT NULL THEN 1 END) as has_altitude
-        FROM '{ACTIVITIES_DIR}/*.parquet'
+            COUNT(DISTINCT file_name) as total_files,
+            COUNT(DISTINCT file_name) FILTER (name = 'heartrate') as has_heartrate,
+            COUNT(DISTINCT file_name) FILTER (name = 'watts') as has_power,
+            COUNT(DISTINCT file_name) FILTER (name = 'cadence') as has_cadence,
+            COUNT(DISTINCT file_name) FILTER (name = 'lat') as has_gps,
+            COUNT(DISTINCT file_name) FILTER (name = 'altitude') as has_altitude
+        FROM parquet_schema('{ACTIVITIES_DIR}/*.parquet')
     """
     ).fetchone()
 
-    conn.close()
-
     return {
         "total_files": result[0],
         "has_heartrate": result[1],
@@ -0,0 +1,57 @@
+"""Small on-disk JSON cache for API responses and derived results."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+CACHE_DIR = Path.home() / ".cache" / "slipstream"
+
+
+def cache_path(namespace: str, key: str) -> Path:
+    """Return the cache file for `key` within `namespace`."""
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return CACHE_DIR / namespace / f"{digest}.json"
+
+
+def load(path: Path, max_age: float | None = None) -> Any | None:
+    """Load a cached value, or None if missing or older than `max_age` seconds."""
+    try:
+        if max_age is not None and time.time() - path.stat().st_mtime > max_age:
+            return None
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def store(path: Path, value: Any) -> None:
+    """Atomically write a JSON-serializable value to the cache."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(value, default=str))
+    tmp.replace(path)
+
+
+def purge(
+    namespace: str, keep: Path | None = None, max_age: float | None = None
+) -> None:
+    """Delete cached entries in `namespace` except `keep`.
+
+    With `max_age`, only entries older than `max_age` seconds are deleted.
+    """
+    now = time.time()
+    for path in (CACHE_DIR / namespace).glob("*.json"):
+        if path == keep:
+            continue
+        try:
+            if max_age is None or now - path.stat().st_mtime > max_age:
+                path.unlink(missing_ok=True)
+        except OSError:
+            # Another process or thread removed or replaced it first
+            continue
@@ -4,7 +4,24 @@ This package-level module re-exports the primary helpers consumers
 should import from `slipstream.ingest`.
 """
 
-from .strava import fetch_activity_streams, list_activities
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from .strava import fetch_activity_streams, list_activities
 
 
 __all__ = ["list_activities", "fetch_activity_streams"]
+
+
+def __getattr__(name: str) -> Any:
+    # Resolve the re-exports on first access (PEP 562) so importing a sibling
+    # such as `slipstream.ingest.auth` doesn't load the Strava client,
+    # settings and requests.
+    if name in __all__:
+        from . import strava
+
+        return getattr(strava, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
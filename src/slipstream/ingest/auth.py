@@ -4,9 +4,16 @@ import time
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
 TOKEN_URL = "https://www.strava.com/oauth/token"
+TOKEN_TIMEOUT = 10
+
+# Reused across token exchanges/refreshes so a long-running process keeps its
+# connection to strava.com alive instead of redoing the TLS handshake.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
 
 
 def build_authorization_url(
@@ -21,7 +28,7 @@ def build_authorization_url(
 def exchange_code_for_token(
     code: str, client_id: str, client_secret: str
 ) -> dict[str, Any]:
-    resp = requests.post(
+    resp = _session.post(
         TOKEN_URL,
         data={
             "client_id": client_id,
@@ -29,6 +36,7 @@ def exchange_code_for_token(
             "code": code,
             "grant_type": "authorization_code",
         },
+        timeout=TOKEN_TIMEOUT,
     )
     resp.raise_for_status()
     return resp.json()
@@ -37,7 +45,7 @@ def exchange_code_for_token(
 def refresh_access_token(
     refresh_token: str, client_id: str, client_secret: str
 ) -> dict[str, Any]:
-    resp = requests.post(
+    resp = _session.post(
         TOKEN_URL,
         data={
             "client_id": client_id,
@@ -45,6 +53,7 @@ def refresh_access_token(
             "grant_type": "refresh_token",
             "refresh_token": refresh_token,
         },
+        timeout=TOKEN_TIMEOUT,
     )
     resp.raise_for_status()
     return resp.json()
@@ -6,18 +6,44 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any
 
-import pandas as pd
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import requests
 
-from slipstream.ingest.strava import fetch_activity_streams, list_activities
+from slipstream.ingest.strava import (
+    configure_session,
+    fetch_activity_streams,
+    list_activities,
+)
+from slipstream.ingest.streams import STREAM_COLUMN_TYPES
 
 
 logger = logging.getLogger(__name__)
 
 ACTIVITIES_DIR = Path("data/activities")
 METADATA_FILE = Path("data/metadata.parquet")
+METADATA_PARTS_DIR = Path("data/metadata_parts")
 FAILURES_LOG = Path("data/failures.log")
 
+ACTIVITIES_PER_PAGE = 200
+
+MAX_ROW_GROUP_SIZE = 50_000
+DATA_PAGE_SIZE = 64 * 1024
+
+# Column types for the streams Strava returns (see STREAM_COLUMN_TYPES).
+# Unknown stream types fall back to Arrow's inferred type.
+STREAM_ARROW_TYPES = {
+    stream_type: pa.type_for_alias(alias)
+    for stream_type, alias in STREAM_COLUMN_TYPES.items()
+    if alias is not None
+}
+
+# Slowly changing integer streams store far smaller as deltas than through a
+# dictionary (time is ~30x smaller, heart rate/cadence/watts roughly half).
+DELTA_ENCODED_STREAMS = ("time", "heartrate", "cadence", "watts")
+
 
 def _ensure_data_dirs() -> None:
     """Create data directories if they don't exist."""
@@ -25,73 +51,161 @@ def _ensure_data_dirs() -> None:
     METADATA_FILE.parent.mkdir(parents=True, exist_ok=True)
 
 
-def _process_stream_data(streams: dict[str, Any]) -> pd.DataFrame:
-    """Convert stream data to DataFrame with lat/lng split."""
+def _process_stream_data(streams: dict[str, Any]) -> pa.Table:
+    """Convert stream data to a typed Arrow table with lat/lng split."""
     data = {}
 
     for stream_type, stream_info in streams.items():
         if stream_type == "latlng":
-            latlng_data = stream_info["data"]
-            data["lat"] = [point[0] if point else None for point in latlng_data]
-            data["lng"] = [point[1] if point else None for point in latlng_data]
+            # Convert the [lat, lng] pairs in one pass and split the columns
+            # in Arrow rather than looping over every point in Python. Empty
+            # points become null, as missing ones already are.
+            latlng = pa.array(stream_info["data"], type=pa.list_(pa.float64()))
+            latlng = pc.if_else(
+                pc.greater(pc.list_value_length(latlng), 0), latlng, None
+            )
+            data["lat"] = pc.list_element(latlng, 0)
+            data["lng"] = pc.list_element(latlng, 1)
         else:
-            data[stream_type] = stream_info["data"]
+            data[stream_type] = pa.array(
+                stream_info["data"], type=STREAM_ARROW_TYPES.get(stream_type)
+            )
 
-    return pd.DataFrame(data)
+    return pa.table(data)
 
 
-def _save_activity_streams(activity_id: int) -> bool:
-    """Fetch and save stream data for a single activity.
+def write_streams_parquet(streams: dict[str, Any], output_file: Path | str) -> int:
+    """Write stream data to a zstd-compressed parquet file.
 
     Returns:
-        bool: True if successful, False if failed
+        int: Number of data points written
     """
-    output_file = ACTIVITIES_DIR / f"{activity_id}.parquet"
+    # Build Arrow columns straight from the API lists; going through a pandas
+    # DataFrame held a second full copy of every stream in memory.
+    table = _process_stream_data(streams)
+    delta_columns = [c for c in table.column_names if c in DELTA_ENCODED_STREAMS]
+    pq.write_table(
+        table,
+        output_file,
+        # One row group per activity (streams are rarely longer than this);
+        # statistics let DuckDB skip row groups when filtering on values.
+        row_group_size=min(table.num_rows, MAX_ROW_GROUP_SIZE) or None,
+        data_page_size=DATA_PAGE_SIZE,
+        use_dictionary=[c for c in table.column_names if c not in delta_columns],
+        column_encoding=dict.fromkeys(delta_columns, "DELTA_BINARY_PACKED"),
+        write_statistics=True,
+        compression="zstd",
+        compression_level=3,
+    )
+    return table.num_rows
 
-    if output_file.exists():
-        logger.info(f"Activity {activity_id}: Already exists, skipping")
-        return True
 
+def _download_activity_streams(activity_id: int) -> dict[str, Any] | None:
+    """Fetch stream data for a single activity (runs on a download worker).
+
+    Returns:
+        dict | None: Stream data, or None if the download failed
+    """
     try:
         streams = fetch_activity_streams(activity_id)
+    except requests.HTTPError as e:
+        logger.error(f"Activity {activity_id}: HTTP error - {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Activity {activity_id}: Failed - {e}")
+        return None
 
-        if not streams:
-            logger.warning(f"Activity {activity_id}: No stream data available")
-            return False
+    if not streams:
+        logger.warning(f"Activity {activity_id}: No stream data available")
+        return None
 
-        df = _process_stream_data(streams)
-        df.to_parquet(output_file, index=False)
+    return streams
 
-        logger.info(f"Activity {activity_id}: Saved {len(df)} data points")
-        return True
 
-    except requests.HTTPError as e:
-        if e.response and e.response.status_code == 429:
-            logger.error(f"Activity {activity_id}: Rate limited (429)")
-            raise
-        logger.error(f"Activity {activity_id}: HTTP error - {e}")
-        return False
+def _save_activity_streams(activity_id: int, streams: dict[str, Any]) -> bool:
+    """Save downloaded stream data for a single activity.
+
+    Returns:
+        bool: True if successful, False if failed
+    """
+    output_file = ACTIVITIES_DIR / f"{activity_id}.parquet"
+
+    try:
+        num_points = write_streams_parquet(streams, output_file)
     except Exception as e:
-        logger.error(f"Activity {activity_id}: Failed - {e}")
+        logger.error(f"Activity {activity_id}: Failed to save - {e}")
         return False
 
+    logger.info(f"Activity {activity_id}: Saved {num_points} data points")
+    return True
 
-def _save_metadata(activities: list[dict[str, Any]]) -> None:
-    """Save activity metadata to parquet file (append mode)."""
+
+def _save_metadata(activities: list[dict[str, Any]], part_name: str) -> None:
+    """Stage a page of activity metadata as its own parquet part file.
+
+    Parts are merged into METADATA_FILE by `_compact_metadata`; a part left
+    behind by an interrupted run is merged by the next one.
+    """
     if not activities:
         return
 
-    new_df = pd.DataFrame(activities)
+    # from_pylist would take its columns from the first activity only, dropping
+    # optional fields (average_heartrate, average_watts, ...) it lacks. Struct
+    # inference covers every row; select() restores the API's field order.
+    columns = list(dict.fromkeys(key for activity in activities for key in activity))
+    table = pa.Table.from_struct_array(pa.array(activities)).select(columns)
+
+    METADATA_PARTS_DIR.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, METADATA_PARTS_DIR / f"{part_name}.parquet")
+
+    logger.info(f"Metadata: Staged {len(activities)} activities")
+
+
+def _compact_metadata() -> None:
+    """Merge staged metadata parts into METADATA_FILE, keeping the last row per id."""
+    # Part names sort in write order, including parts left by an earlier
+    # interrupted run, so the most recently fetched copy of an activity wins.
+    parts = sorted(METADATA_PARTS_DIR.glob("*.parquet"))
+    if not parts:
+        return
 
-    if METADATA_FILE.exists():
-        existing_df = pd.read_parquet(METADATA_FILE)
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-        combined_df.drop_duplicates(subset=["id"], keep="last", inplace=True)
-        combined_df.to_parquet(METADATA_FILE, index=False)
-    else:
-        new_df.to_parquet(METADATA_FILE, index=False)
+    # The existing file goes first so any part's copy of an activity wins
+    sources = [str(path) for path in [METADATA_FILE, *parts] if path.exists()]
+    tmp_file = METADATA_FILE.with_name(f"{METADATA_FILE.name}.tmp")
 
-    logger.info(f"Metadata: Saved {len(activities)} activities")
+    conn = duckdb.connect()
+    try:
+        # COPY returns the number of rows it wrote
+        (num_activities,) = conn.execute(
+            f"""
+            COPY (
+                SELECT * EXCLUDE (filename, file_row_number)
+                FROM read_parquet(
+                    $sources,
+                    union_by_name = true,
+                    filename = true,
+                    file_row_number = true
+                )
+                QUALIFY row_number() OVER (
+                    PARTITION BY id
+                    ORDER BY list_position($sources, filename) DESC,
+                        file_row_number DESC
+                ) = 1
+                ORDER BY list_position($sources, filename), file_row_number
+            ) TO '{tmp_file}' (FORMAT PARQUET, COMPRESSION ZSTD)
+            """,
+            {"sources": sources},
+        ).fetchone()
+    finally:
+        conn.close()
+
+    # Swap the file in atomically so readers never see a partial write
+    tmp_file.replace(METADATA_FILE)
+
+    for part in parts:
+        part.unlink()
+
+    logger.info(f"Metadata: Saved {num_activities} activities")
 
 
 def backfill_activities(
@@ -109,6 +223,8 @@ def backfill_activities(
         max_workers: Number of parallel threads for downloading (default: 5)
     """
     _ensure_data_dirs()
+    # One extra connection for the page prefetch alongside the stream workers
+    configure_session(max_workers + 1)
 
     logging.basicConfig(
         level=logging.INFO,
@@ -116,6 +232,7 @@ def backfill_activities(
     )
 
     page = 1
+    run_id = time.time_ns()
     total_processed = 0
     total_failed = 0
     failures = []
@@ -127,49 +244,91 @@ def backfill_activities(
     if after:
         logger.info(f"Filtering activities after: {after}")
 
-    while True:
-        logger.info(f"Fetching page {page}...")
-
-        try:
-            activities = list_activities(
-                per_page=200, page=page, before=before, after=after
-            )
-        except Exception as e:
-            logger.error(f"Failed to fetch activities page {page}: {e}")
-            break
+    # List the output directory once rather than stat-ing a file per activity
+    existing = {
+        int(path.stem)
+        for path in ACTIVITIES_DIR.glob("*.parquet")
+        if path.stem.isdigit()
+    }
 
-        if not activities:
-            logger.info("No more activities to process")
-            break
-
-        logger.info(f"Processing {len(activities)} activities from page {page}")
+    def fetch_page(page: int) -> list[dict[str, Any]]:
+        logger.info(f"Fetching page {page}...")
+        # Always hit the API: pages are walked over a long run, and mixing
+        # cached pages with fresh ones skips activities whose position shifted
+        # after a new upload.
+        return list_activities(
+            per_page=ACTIVITIES_PER_PAGE,
+            page=page,
+            before=before,
+            after=after,
+            refresh=True,
+        )
+
+    # One pool for the whole run so worker threads are reused across pages
+    # instead of being spun up and torn down for every page. A separate
+    # single thread fetches the next page while this one's streams download.
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    page_executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        next_page = page_executor.submit(fetch_page, page)
+        while True:
+            try:
+                activities = next_page.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch activities page {page}: {e}")
+                break
 
-        _save_metadata(activities)
+            if not activities:
+                logger.info("No more activities to process")
+                break
 
-        activities_to_process = []
-        for activity in activities:
-            if (
-                max_activities
-                and total_processed + len(activities_to_process) >= max_activities
+            # Prefetch the next page unless this one is the last we need
+            if len(activities) == ACTIVITIES_PER_PAGE and not (
+                max_activities and total_processed + len(activities) >= max_activities
             ):
+                next_page = page_executor.submit(fetch_page, page + 1)
+
+            logger.info(f"Processing {len(activities)} activities from page {page}")
+
+            # Publish the page right away: under the rate limiter its streams
+            # take ~30 minutes to download, and readers should see each
+            # activity's metadata by the time its stream file lands.
+            _save_metadata(activities, f"{run_id}-{page:05d}")
+            _compact_metadata()
+
+            activities_to_process = []
+            for activity in activities:
+                if (
+                    max_activities
+                    and total_processed + len(activities_to_process) >= max_activities
+                ):
+                    break
+                activities_to_process.append(activity["id"])
+
+            if not activities_to_process:
+                if max_activities:
+                    logger.info(f"Reached max activities limit ({max_activities})")
                 break
-            activities_to_process.append(activity["id"])
-
-        if not activities_to_process:
-            if max_activities:
-                logger.info(f"Reached max activities limit ({max_activities})")
-            break
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_activity = {
-                executor.submit(_save_activity_streams, activity_id): activity_id
-                for activity_id in activities_to_process
-            }
+            # Workers only download; this thread converts and writes each
+            # activity as it completes, overlapping compression with the
+            # remaining network I/O.
+            future_to_activity = {}
+            for activity_id in activities_to_process:
+                if activity_id in existing:
+                    logger.info(f"Activity {activity_id}: Already exists, skipping")
+                    total_processed += 1
+                    continue
+                future = executor.submit(_download_activity_streams, activity_id)
+                future_to_activity[future] = activity_id
 
             for future in as_completed(future_to_activity):
                 activity_id = future_to_activity[future]
                 try:
-                    success = future.result()
+                    streams = future.result()
+                    success = streams is not None and _save_activity_streams(
+                        activity_id, streams
+                    )
                     if not success:
                         total_failed += 1
                         failures.append(activity_id)
@@ -180,17 +339,26 @@ def backfill_activities(
 
                 total_processed += 1
 
-        if max_activities and total_processed >= max_activities:
-            logger.info(f"Reached max activities limit ({max_activities})")
-            break
-
-        if len(activities) < 200:
-            logger.info("Reached end of activities (last page)")
-            break
+            if max_activities and total_processed >= max_activities:
+                logger.info(f"Reached max activities limit ({max_activities})")
+                break
 
-        page += 1
+            if len(activities) < ACTIVITIES_PER_PAGE:
+                logger.info("Reached end of activities (last page)")
+                break
 
-        time.sleep(1)
+            page += 1
+    finally:
+        # On Ctrl-C or an error, drop queued downloads instead of waiting for
+        # each one's rate-limit slot. After a normal run nothing is queued.
+        executor.shutdown(wait=False, cancel_futures=True)
+        page_executor.shutdown(wait=False, cancel_futures=True)
+        # Merge anything still staged, without masking the error that got us
+        # here; unmerged parts are picked up by the next run.
+        try:
+            _compact_metadata()
+        except Exception as e:
+            logger.error(f"Metadata: Failed to merge staged pages - {e}")
 
     logger.info(
         f"Backfill complete: {total_processed} processed, {total_failed} failed"
@@ -204,7 +372,6 @@ def _log_failures(failures: list[int]) -> None:
         return
 
     with open(FAILURES_LOG, "a") as f:
-        for activity_id in failures:
-            f.write(f"{activity_id}\n")
+        f.write("".join(f"{activity_id}\n" for activity_id in failures))
 
     logger.info(f"Logged {len(failures)} failures to {FAILURES_LOG}")
@@ -1,11 +1,102 @@
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from slipstream import cache
 from slipstream.ingest.auth import is_token_expired, refresh_access_token
+from slipstream.ingest.streams import STREAM_TYPES
 from slipstream.settings import settings
 
 
+API_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 20
+
+# Rate limits (429) and transient server errors are retried with exponential
+# backoff, honouring Retry-After when Strava sends it. Once retries run out
+# the last response is returned so callers still see a normal HTTPError.
+API_RETRY = Retry(
+    total=8,
+    backoff_factor=2,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET"],
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+def _make_adapter(pool_maxsize: int) -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_maxsize, max_retries=API_RETRY
+    )
+
+
+# One session for the process so requests reuse keep-alive connections to
+# strava.com instead of paying a TCP + TLS handshake on every call.
+_session = requests.Session()
+_session.mount("https://", _make_adapter(DEFAULT_POOL_SIZE))
+
+
+class _RateLimiter:
+    """Token bucket shared by every thread calling the Strava API.
+
+    Allows a small initial burst, then refills evenly. The refill rate leaves
+    room for the burst, so no `window`-second span (including Strava's fixed
+    quarter-hour windows) ever sees more than `max_requests` calls.
+    """
+
+    def __init__(self, max_requests: int, window: float, burst: int = 10) -> None:
+        burst = min(burst, max_requests - 1)
+        self._capacity = float(burst)
+        self._rate = (max_requests - burst) / window
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            # Reserve the token now and wait outside the lock, so queued
+            # threads are released one refill interval apart.
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+        if wait:
+            time.sleep(wait)
+
+
+_rate_limiter = _RateLimiter(
+    settings.STRAVA_RATE_LIMIT_REQUESTS, settings.STRAVA_RATE_LIMIT_WINDOW
+)
+
+# Serializes token refreshes across worker threads
+_token_lock = threading.Lock()
+
+# Any page can change (renames, deletions, backdated uploads shifting page
+# boundaries), so every cached page expires after this many seconds
+ACTIVITIES_CACHE_TTL = 3600
+
+
+def configure_session(max_workers: int) -> None:
+    """Size the shared connection pool for `max_workers` concurrent requests.
+
+    With fewer pooled connections than threads, urllib3 discards the extra
+    connections after each request and the next call pays a new handshake.
+    """
+    _session.mount("https://", _make_adapter(max_workers))
+
+
 def _get_bearer_token() -> str:
     if not settings.STRAVA_ACCESS_TOKEN:
         raise RuntimeError(
@@ -14,31 +105,42 @@ def _get_bearer_token() -> str:
         )
 
     if settings.STRAVA_EXPIRES_AT and is_token_expired(settings.STRAVA_EXPIRES_AT):
-        if not settings.STRAVA_REFRESH_TOKEN:
-            raise RuntimeError("Token expired and no refresh token available.")
+        # Backfill workers hit expiry together; only the first one refreshes
+        # and the rest pick up the new token once the lock is released.
+        with _token_lock:
+            if is_token_expired(settings.STRAVA_EXPIRES_AT):
+                _refresh_bearer_token()
 
-        new_tokens = refresh_access_token(
-            settings.STRAVA_REFRESH_TOKEN,
-            str(settings.STRAVA_CLIENT_ID),
-            settings.STRAVA_CLIENT_SECRET,
-        )
+    return settings.STRAVA_ACCESS_TOKEN
 
-        settings.STRAVA_ACCESS_TOKEN = new_tokens["access_token"]
-        settings.STRAVA_REFRESH_TOKEN = new_tokens["refresh_token"]
-        settings.STRAVA_EXPIRES_AT = new_tokens["expires_at"]
 
-    return settings.STRAVA_ACCESS_TOKEN
+def _refresh_bearer_token() -> None:
+    if not settings.STRAVA_REFRESH_TOKEN:
+        raise RuntimeError("Token expired and no refresh token available.")
+
+    new_tokens = refresh_access_token(
+        settings.STRAVA_REFRESH_TOKEN,
+        str(settings.STRAVA_CLIENT_ID),
+        settings.STRAVA_CLIENT_SECRET,
+    )
+
+    settings.STRAVA_ACCESS_TOKEN = new_tokens["access_token"]
+    settings.STRAVA_REFRESH_TOKEN = new_tokens["refresh_token"]
+    settings.STRAVA_EXPIRES_AT = new_tokens["expires_at"]
 
 
 def fetch_activity_streams(
     activity_id: int,
-    keys: str = "time,latlng,distance,altitude,velocity_smooth,heartrate,cadence,watts,temp,moving,grade_smooth",
+    keys: str | Iterable[str] = STREAM_TYPES,
 ) -> dict[str, Any]:
     token = _get_bearer_token()
     url = f"https://www.strava.com/api/v3/activities/{activity_id}/streams"
     headers = {"Authorization": f"Bearer {token}"}
+    if not isinstance(keys, str):
+        keys = ",".join(keys)
     params = {"keys": keys, "key_by_type": True}
-    resp = requests.get(url, headers=headers, params=params)
+    _rate_limiter.acquire()
+    resp = _session.get(url, headers=headers, params=params, timeout=API_TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
@@ -48,22 +150,25 @@ def list_activities(
     page: int = 1,
     before: int | None = None,
     after: int | None = None,
+    refresh: bool = False,
 ) -> Any:
     """List athlete activities.
 
+    Responses are cached on disk keyed by query string and expire after
+    ACTIVITIES_CACHE_TTL seconds; expired entries are removed on the next
+    fetch from the API.
+
     Args:
         per_page: Number of activities per page (max 200)
         page: Page number
         before: Epoch timestamp to filter activities before this time
         after: Epoch timestamp to filter activities after this time
                (results will be sorted oldest first when using after)
+        refresh: Ignore any cached response and fetch from the API
 
     Returns:
         List of activity dictionaries
     """
-    token = _get_bearer_token()
-    url = "https://www.strava.com/api/v3/athlete/activities"
-    headers = {"Authorization": f"Bearer {token}"}
     params = {"per_page": per_page, "page": page}
 
     if before is not None:
@@ -71,6 +176,58 @@ def list_activities(
     if after is not None:
         params["after"] = after
 
-    resp = requests.get(url, headers=headers, params=params)
+    cache_file = cache.cache_path("activities", urlencode(sorted(params.items())))
+    if not refresh:
+        cached = cache.load(cache_file, max_age=ACTIVITIES_CACHE_TTL)
+        if cached is not None:
+            return cached
+
+    token = _get_bearer_token()
+    url = "https://www.strava.com/api/v3/athlete/activities"
+    headers = {"Authorization": f"Bearer {token}"}
+
+    _rate_limiter.acquire()
+    resp = _session.get(url, headers=headers, params=params, timeout=API_TIMEOUT)
     resp.raise_for_status()
-    return resp.json()
+    activities = resp.json()
+    cache.store(cache_file, activities)
+    cache.purge("activities", max_age=ACTIVITIES_CACHE_TTL)
+    return activities
+
+
+def list_activity_pages(
+    pages: int,
+    per_page: int = 30,
+    page: int = 1,
+    before: int | None = None,
+    after: int | None = None,
+    max_workers: int = 4,
+    refresh: bool = False,
+) -> list[Any]:
+    """Fetch consecutive pages of athlete activities concurrently.
+
+    Args:
+        pages: Number of pages to fetch, starting at `page`
+        per_page: Number of activities per page (max 200)
+        page: First page number
+        before: Epoch timestamp to filter activities before this time
+        after: Epoch timestamp to filter activities after this time
+        max_workers: Number of pages to request in parallel
+        refresh: Ignore any cached responses and fetch from the API
+
+    Returns:
+        List of activity lists, one per page, in page order
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                lambda p: list_activities(
+                    per_page=per_page,
+                    page=p,
+                    before=before,
+                    after=after,
+                    refresh=refresh,
+                ),
+                range(page, page + pages),
+            )
+        )
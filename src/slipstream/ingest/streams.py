@@ -0,0 +1,24 @@
+"""Strava stream types and the parquet column type each is stored as.
+
+Kept free of heavy imports so the CLI can build its options without loading
+the HTTP client, settings or pyarrow.
+"""
+
+# Stream type -> Arrow type alias (pyarrow.type_for_alias) for its column.
+# Narrow ints and floats encode much tighter; latlng is split into float64
+# lat/lng columns instead, since float32 would lose ~1m of precision.
+STREAM_COLUMN_TYPES: dict[str, str | None] = {
+    "time": "int32",
+    "latlng": None,
+    "distance": "float32",
+    "altitude": "float32",
+    "velocity_smooth": "float32",
+    "heartrate": "int16",
+    "cadence": "int16",
+    "watts": "int16",
+    "temp": "int8",
+    "moving": "bool",
+    "grade_smooth": "float32",
+}
+
+STREAM_TYPES = tuple(STREAM_COLUMN_TYPES)
@@ -12,6 +12,10 @@ class Settings(BaseSettings):
     STRAVA_REFRESH_TOKEN: str | None = None
     STRAVA_EXPIRES_AT: int | None = None
 
+    # Strava's default read quota is 100 requests per 15 minutes
+    STRAVA_RATE_LIMIT_REQUESTS: int = 100
+    STRAVA_RATE_LIMIT_WINDOW: int = 900
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
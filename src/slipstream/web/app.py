@@ -2,31 +2,75 @@
 
 from __future__ import annotations
 
+import threading
 from pathlib import Path
 
 import duckdb
-from fastapi import FastAPI, Query
-from fastapi.responses import FileResponse
+import pyarrow as pa
+from fastapi import FastAPI, Header, Query
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 from slipstream.analysis.query import METADATA_FILE
-from slipstream.web.models import (
-    ActivitiesResponse,
-    ActivitySummary,
-    FilterOptions,
-)
+from slipstream.web.models import ActivitiesResponse, FilterOptions
 
 
 app = FastAPI(title="Slipstream Map Viewer")
 
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
 # Mount static files
 STATIC_DIR = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
-# Simple in-memory cache
-_activity_cache: dict | None = None
-_cache_timestamp: float | None = None
-CACHE_TTL = 300  # 5 minutes
+# Metadata is loaded into an in-memory DuckDB table and only reloaded when the
+# parquet file changes, so requests don't re-read and decode it every time.
+# Filter options only change with the metadata, so they're computed on reload.
+# Endpoints are sync so FastAPI runs them in its threadpool, each request on
+# its own cursor of the shared connection.
+_conn = duckdb.connect(":memory:")
+_metadata_mtime_ns: int | None = None
+_metadata_lock = threading.Lock()
+_filter_options: FilterOptions | None = None
+
+
+def _refresh_metadata() -> None:
+    """Load metadata into the in-memory table if the parquet file changed."""
+    global _metadata_mtime_ns, _filter_options
+
+    mtime_ns = METADATA_FILE.stat().st_mtime_ns
+    if mtime_ns == _metadata_mtime_ns:
+        return
+
+    with _metadata_lock:
+        if mtime_ns != _metadata_mtime_ns:
+            _conn.execute(
+                f"CREATE OR REPLACE TABLE metadata AS SELECT * FROM '{METADATA_FILE}'"
+            )
+            _filter_options = _compute_filter_options()
+            _metadata_mtime_ns = mtime_ns
+
+
+def _compute_filter_options() -> FilterOptions:
+    """Compute filter options from the metadata table in a single pass."""
+    types, min_distance, max_distance, min_elevation, max_elevation = _conn.execute(
+        """
+        SELECT
+            list(DISTINCT type ORDER BY type),
+            MIN(distance),
+            MAX(distance),
+            MIN(total_elevation_gain),
+            MAX(total_elevation_gain)
+        FROM metadata
+        WHERE map.summary_polyline != ''
+    """
+    ).fetchone()
+
+    return FilterOptions(
+        types=types or [],
+        distance_range={"min": min_distance or 0, "max": max_distance or 0},
+        elevation_range={"min": min_elevation or 0, "max": max_elevation or 0},
+    )
 
 
 def _build_where_clause(
@@ -35,22 +79,28 @@ def _build_where_clause(
     max_distance: float | None = None,
     min_elevation: float | None = None,
     max_elevation: float | None = None,
-) -> str:
-    """Build WHERE clause for activity filtering."""
+) -> tuple[str, list]:
+    """Build WHERE clause and its bound parameters for activity filtering."""
     conditions = ["map.summary_polyline != ''"]
+    params: list = []
 
     if type_filter:
-        conditions.append(f"type = '{type_filter}'")
+        conditions.append("type = ?")
+        params.append(type_filter)
     if min_distance is not None:
-        conditions.append(f"distance >= {min_distance}")
+        conditions.append("distance >= ?")
+        params.append(min_distance)
     if max_distance is not None:
-        conditions.append(f"distance <= {max_distance}")
+        conditions.append("distance <= ?")
+        params.append(max_distance)
     if min_elevation is not None:
-        conditions.append(f"total_elevation_gain >= {min_elevation}")
+        conditions.append("total_elevation_gain >= ?")
+        params.append(min_elevation)
     if max_elevation is not None:
-        conditions.append(f"total_elevation_gain <= {max_elevation}")
+        conditions.append("total_elevation_gain <= ?")
+        params.append(max_elevation)
 
-    return " AND ".join(conditions)
+    return " AND ".join(conditions), params
 
 
 @app.get("/")
@@ -60,7 +110,7 @@ async def serve_frontend():
 
 
 @app.get("/api/activities", response_model=ActivitiesResponse)
-async def get_activities(
+def get_activities(
     type: str | None = Query(None, description="Filter by activity type"),
     min_distance: float | None = Query(None, description="Minimum distance in meters"),
     max_distance: float | None = Query(None, description="Maximum distance in meters"),
@@ -70,89 +120,56 @@ async def get_activities(
     max_elevation: float | None = Query(
         None, description="Maximum elevation gain in meters"
     ),
+    accept: str | None = Header(
+        None, description=f"Send {ARROW_STREAM_MEDIA_TYPE} for an Arrow IPC stream"
+    ),
 ):
     """Get all activities with GPS data, optionally filtered."""
-    conn = duckdb.connect(":memory:")
+    _refresh_metadata()
 
-    where_clause = _build_where_clause(
+    where_clause, params = _build_where_clause(
         type, min_distance, max_distance, min_elevation, max_elevation
     )
 
     query = f"""
         SELECT
             id, name, type, sport_type, distance, total_elevation_gain,
-            start_date, start_latlng, end_latlng,
+            start_date,
+            nullif(start_latlng, []) as start_latlng,
+            nullif(end_latlng, []) as end_latlng,
             map.summary_polyline as polyline,
             moving_time, average_speed
-        FROM '{METADATA_FILE}'
+        FROM metadata
         WHERE {where_clause}
         ORDER BY start_date DESC
     """
 
-    results = conn.execute(query).fetchall()
-    conn.close()
-
-    activities = [
-        ActivitySummary(
-            id=row[0],
-            name=row[1],
-            type=row[2],
-            sport_type=row[3],
-            distance=row[4],
-            total_elevation_gain=row[5],
-            start_date=row[6],
-            start_latlng=list(row[7]) if row[7] else None,
-            end_latlng=list(row[8]) if row[8] else None,
-            polyline=row[9],
-            moving_time=row[10],
-            average_speed=row[11],
+    cursor = _conn.cursor().execute(query, params)
+
+    # Arrow clients get the columnar result as-is, with no per-row objects
+    if accept and ARROW_STREAM_MEDIA_TYPE in accept:
+        reader = cursor.fetch_record_batch()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+        return Response(
+            sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE
         )
-        for row in results
-    ]
 
-    return ActivitiesResponse(activities=activities, count=len(activities))
+    columns = [column[0] for column in cursor.description]
+    results = cursor.fetchall()
 
+    # Rows already match ActivitySummary, so skip building a model per row
+    # and let JSONResponse serialize plain dicts (response_model stays for
+    # the API docs).
+    activities = [dict(zip(columns, row, strict=True)) for row in results]
 
-@app.get("/api/filter-options", response_model=FilterOptions)
-async def get_filter_options():
-    """Get available filter options."""
-    conn = duckdb.connect(":memory:")
+    return JSONResponse({"activities": activities, "count": len(activities)})
 
-    # Get unique types (only for activities with GPS)
-    types = conn.execute(
-        f"""
-        SELECT DISTINCT type
-        FROM '{METADATA_FILE}'
-        WHERE map.summary_polyline != ''
-        ORDER BY type
-    """
-    ).fetchall()
 
-    # Get distance range
-    distance_range = conn.execute(
-        f"""
-        SELECT MIN(distance), MAX(distance)
-        FROM '{METADATA_FILE}'
-        WHERE map.summary_polyline != ''
-    """
-    ).fetchone()
-
-    # Get elevation range
-    elevation_range = conn.execute(
-        f"""
-        SELECT MIN(total_elevation_gain), MAX(total_elevation_gain)
-        FROM '{METADATA_FILE}'
-        WHERE map.summary_polyline != '' AND total_elevation_gain IS NOT NULL
-    """
-    ).fetchone()
-
-    conn.close()
-
-    return FilterOptions(
-        types=[t[0] for t in types],
-        distance_range={"min": distance_range[0] or 0, "max": distance_range[1] or 0},
-        elevation_range={
-            "min": elevation_range[0] or 0,
-            "max": elevation_range[1] or 0,
-        },
-    )
+@app.get("/api/filter-options", response_model=FilterOptions)
+def get_filter_options():
+    """Get available filter options."""
+    _refresh_metadata()
+    return _filter_options